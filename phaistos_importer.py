@@ -2,15 +2,78 @@ import click
 import requests
 import json
 import re
+import io
+import os
+import mmap
+import codecs
+import contextlib
+import tempfile
+import heapq
+import itertools
+import concurrent.futures
+import threading
+import collections
+import hashlib
+import gzip
+import time
 import openpyxl
 import csv
 import xlrd
 from datetime import datetime
 from urllib.parse import urlparse, urljoin, parse_qs
 
+REPORT_FORMAT_CSV = 'csv'
+REPORT_FORMAT_XLS = 'xls'
+REPORT_FORMAT_XLSX = 'xlsx'
+
+# legacy MySchool exports are Greek windows code page
+DEFAULT_REPORT_ENCODING = 'cp1253'
+DEFAULT_CSV_DELIMITER = ';'
+DEFAULT_CSV_QUOTECHAR = '|'
+
+# how many bytes we look at when sniffing a report
+SNIFF_SAMPLE_SIZE = 64 * 1024
+
 def datetime_to_date_str(value: datetime) -> str:
     return value.strftime('%d/%m/%Y')
 
+def xl_value_to_datetime(value, datemode: int = 0) -> datetime:
+    """
+    Returns a datetime for a report value which is either already a datetime
+    (openpyxl, typed xlrd date cells), a raw excel serial number of a
+    workbook using datemode, or a dd/mm/YYYY string (CSV reports)
+    """
+    if isinstance(value, datetime):
+        return value
+
+    if isinstance(value, str):
+        return datetime.strptime(value.strip(), '%d/%m/%Y')
+
+    return datetime(*xlrd.xldate_as_tuple(value, datemode))
+
+class XlsRow(list):
+    """
+    A row of a legacy .xls report, carrying the date mode of its workbook
+    so that untyped serial dates can still be converted
+    """
+    datemode = 0
+
+def cell_value_to_str(value) -> str:
+    """
+    Renders a spreadsheet cell value the way it would appear in the CSV
+    variant of the same report
+    """
+    if value is None:
+        return ''
+
+    if isinstance(value, datetime):
+        return datetime_to_date_str(value)
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
 def str_to_bool(value: str) -> bool:
     if value is not None:
         if value in ['1', 'yes', 'NAI', 'Ναι', 'true', 'True']:
@@ -51,136 +114,1031 @@ def is_empty_or_null(value: str) -> bool:
     return value is None or len(value) == 0
 
 
+def detect_report_format(sample: bytes) -> str:
+    """
+    Detects the container format of a report from its first bytes
+    """
+    if sample.startswith(b'PK\x03\x04'):
+        # zip container, office open xml
+        return REPORT_FORMAT_XLSX
+
+    if sample.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        # OLE2 compound document, legacy excel
+        return REPORT_FORMAT_XLS
+
+    return REPORT_FORMAT_CSV
+
+
+def detect_text_encoding(sample: bytes) -> str:
+    """
+    Detects the encoding of a text report. A BOM always wins, otherwise the
+    sample is checked for valid UTF-8 multibyte sequences, falling back to
+    the legacy cp1253 encoding
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+
+    if sample.isascii():
+        # no way to tell, keep the legacy encoding
+        return DEFAULT_REPORT_ENCODING
+
+    # the sample may end in the middle of a multibyte sequence
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        decoder.decode(sample, final=False)
+    except UnicodeDecodeError:
+        return DEFAULT_REPORT_ENCODING
+
+    return 'utf-8'
+
+
+def detect_csv_delimiter(header: str) -> str:
+    """
+    Detects the delimiter of a text report by looking at its header line
+    """
+    counts = {delimiter: header.count(delimiter) for delimiter in [';', ',', '\t']}
+    delimiter = max(counts, key=counts.get)
+
+    if counts[delimiter] == 0:
+        return DEFAULT_CSV_DELIMITER
+
+    return delimiter
+
+
+def sniff_report(stream, encoding: str = None) -> dict:
+    """
+    Sniffs container format, encoding and delimiter from the first bytes of
+    a seekable binary stream. The stream is rewound afterwards.
+    """
+    start = stream.tell()
+    sample = stream.read(SNIFF_SAMPLE_SIZE)
+    stream.seek(start)
+
+    report_format = detect_report_format(sample)
+    result = {
+        'format': report_format,
+        'encoding': encoding,
+        'delimiter': DEFAULT_CSV_DELIMITER,
+    }
+
+    if report_format == REPORT_FORMAT_CSV:
+        if encoding is None:
+            result['encoding'] = detect_text_encoding(sample)
+        header = sample.split(b'\n', 1)[0].decode(result['encoding'], errors='replace')
+        result['delimiter'] = detect_csv_delimiter(header)
+
+    return result
+
+
+@contextlib.contextmanager
+def open_report_source(source):
+    """
+    Opens a report given as a path, a bytes buffer or a file object as a
+    seekable binary stream. File objects are left open.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as stream:
+            yield stream
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif isinstance(source, io.TextIOBase):
+        yield io.BytesIO(source.read().encode('utf-8'))
+    elif source.seekable():
+        yield source
+    else:
+        yield io.BytesIO(source.read())
+
+
+def source_encoding(source, encoding: str = None) -> str:
+    """
+    Returns the encoding to read a report source with. Text file objects are
+    re-encoded to UTF-8 by open_report_source, whatever encoding was asked.
+    """
+    if isinstance(source, io.TextIOBase):
+        return 'utf-8'
+
+    return encoding
+
+
+def iter_report_rows(source, skip_rows: int = 0, as_text: bool = False, encoding: str = None):
+    """
+    Yields the rows of a report as lists of values, whatever its container
+    format. When as_text is set spreadsheet values are rendered as strings,
+    so that CSV oriented commands can consume .xls/.xlsx variants too.
+    """
+    encoding = source_encoding(source, encoding)
+
+    with open_report_source(source) as stream:
+        report = sniff_report(stream, encoding=encoding)
+        text = None
+
+        if report['format'] == REPORT_FORMAT_CSV:
+            text = io.TextIOWrapper(stream, encoding=report['encoding'], newline='')
+            reader = csv.reader(text, delimiter=report['delimiter'], quotechar=DEFAULT_CSV_QUOTECHAR)
+            rows = (row for row in reader)
+        elif report['format'] == REPORT_FORMAT_XLS:
+            book = xlrd.open_workbook(file_contents=stream.read(),
+                                      encoding_override=report['encoding'] or DEFAULT_REPORT_ENCODING)
+            rows = _iter_xls_rows(book)
+        else:
+            book = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+            rows = (list(row) for row in book.worksheets[0].iter_rows(values_only=True))
+
+        try:
+            for index, row in enumerate(rows):
+                if index < skip_rows:
+                    continue
+
+                if as_text and report['format'] != REPORT_FORMAT_CSV:
+                    row = [cell_value_to_str(value) for value in row]
+
+                yield row
+        finally:
+            if text is not None:
+                # do not let the wrapper close a stream we do not own
+                text.detach()
+
+
+def iter_filtered_report_rows(source, predicates: dict, skip_rows: int = 0, as_text: bool = True,
+                              encoding: str = None):
+    """
+    Yields the rows of a report whose columns match the given
+    {column index: value} predicates. CSV report files are memory mapped and
+    the predicates are checked against the raw bytes, so only matching lines
+    are ever decoded and parsed. Other reports fall back to iter_report_rows.
+
+    Predicates are expected most selective first (e.g. AM/AFM before the
+    employee type): the scan jumps between occurrences of the first one.
+    """
+    encoding = source_encoding(source, encoding)
+
+    with open_report_source(source) as stream:
+        report = sniff_report(stream, encoding=encoding)
+        is_file = isinstance(source, (str, os.PathLike))
+        size = os.fstat(stream.fileno()).st_size if is_file else 0
+        report_encoding = codecs.lookup(report['encoding'] or DEFAULT_REPORT_ENCODING).name
+
+        if report['format'] != REPORT_FORMAT_CSV or report_encoding.startswith('utf-16') \
+                or size == 0 or not predicates:
+            for row in iter_report_rows(stream, skip_rows=skip_rows, as_text=as_text, encoding=encoding):
+                if all(_field_matches(row, col, value) for col, value in predicates.items()):
+                    yield row
+            return
+
+        text_encoding = 'utf-8' if report_encoding == 'utf-8-sig' else report_encoding
+        delimiter = report['delimiter'].encode(text_encoding)
+        quotechar = DEFAULT_CSV_QUOTECHAR.encode(text_encoding)
+        needles = {col: value.encode(text_encoding) for col, value in predicates.items()}
+        # jump between occurrences of the most selective needle instead of visiting every line
+        anchor = next(iter(needles.values()))
+
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = len(codecs.BOM_UTF8) if mm[:3] == codecs.BOM_UTF8 else 0
+            for _ in range(skip_rows):
+                pos = mm.find(b'\n', pos) + 1
+                if pos == 0:
+                    return
+
+            while True:
+                hit = mm.find(anchor, pos)
+                if hit == -1:
+                    return
+
+                start = max(mm.rfind(b'\n', pos, hit) + 1, pos)
+                end = mm.find(b'\n', hit)
+                if end == -1:
+                    end = size
+                pos = end + 1
+
+                line = mm[start:end].rstrip(b'\r')
+
+                if quotechar in line:
+                    # quoted fields may hide delimiters, let csv sort it out
+                    row = _parse_csv_line(line, text_encoding, report['delimiter'])
+                    if all(_field_matches(row, col, value) for col, value in predicates.items()):
+                        yield row
+                    continue
+
+                fields = line.split(delimiter)
+                if all(_raw_field_matches(fields, col, needle) for col, needle in needles.items()):
+                    yield _parse_csv_line(line, text_encoding, report['delimiter'])
+
+
+def _parse_csv_line(line: bytes, encoding: str, delimiter: str) -> list:
+    return next(csv.reader([line.decode(encoding)], delimiter=delimiter, quotechar=DEFAULT_CSV_QUOTECHAR))
+
+
+def _field_matches(row: list, col: int, value: str) -> bool:
+    return col < len(row) and filter_cvs_column(cell_value_to_str(row[col])) == value
+
+
+def _raw_field_matches(fields: list, col: int, needle: bytes) -> bool:
+    return col < len(fields) and fields[col] in (needle, b'"=""' + needle + b'"""')
+
+
+def _iter_xls_rows(book):
+    sh = book.sheet_by_index(0)
+
+    for rx in range(sh.nrows):
+        row = XlsRow()
+        row.datemode = book.datemode
+        for cell in sh.row(rx):
+            if cell.ctype == xlrd.XL_CELL_DATE:
+                row.append(datetime(*xlrd.xldate_as_tuple(cell.value, book.datemode)))
+            else:
+                row.append(cell.value)
+        yield row
+
+
+def employee_report_04_01_row_to_dict(row: list) -> dict:
+    """
+    Builds the employee request object from a row of myschool report 4.1
+    """
+    _employee_am = row[0]
+    _employee_afm = filter_cvs_column(row[1])
+    _employee_sex = row[2]
+    _employee_last_name = row[3]
+    _employee_first_name = row[4]
+    _employee_father_name = row[5]
+    _employee_mother_name = row[6]
+    _employee_birthday = row[51]
+    _employee_telephone = row[9]
+    _employee_mobile = row[10]
+    _employee_email = row[12]
+    _employee_email_psd = row[13]
+    _employee_type_name = row[47]
+
+    _employee_current_unit_id = row[35]
+    _employee_current_unit_name = row[36]
+    _employee_specialization_id = row[14]
+    _employee_specialization_name = row[15]
+    _employee_mandatory_week_workhours = row[25]
+    _employee_mk = row[19]
+    _employee_bathmos = row[18]
+    _employee_first_workday_date = row[32]
+    _employee_fek_diorismou = row[20]
+    _employee_fek_diorismou_date = row[21]
+    
+    # normalization
+    _employee_current_unit_id = filter_cvs_column(_employee_current_unit_id)
+
+    return {
+        'employee_am': _employee_am,
+        'employee_afm': _employee_afm,
+        'employee_sex': _employee_sex,
+        'employee_last_name': _employee_last_name,
+        'employee_first_name': _employee_first_name,
+        'employee_father_name': _employee_father_name,
+        'employee_mother_name': _employee_mother_name,
+        'employee_telephone': _employee_telephone,
+        'employee_mobile': _employee_mobile,
+        'employee_email': _employee_email,
+        'employee_email_psd': _employee_email_psd,
+        'employee_type_name': _employee_type_name,
+        'employee_current_unit_id': _employee_current_unit_id,
+        'employee_current_unit_name': _employee_current_unit_name,
+        'employee_specialization_id': _employee_specialization_id,
+        'employee_specialization_name': _employee_specialization_name,
+        'employee_mandatory_week_workhours': _employee_mandatory_week_workhours,
+        'employee_mk': _employee_mk,
+        'employee_bathmos': _employee_bathmos,
+        'employee_first_workday_date': _employee_first_workday_date,
+        'employee_fek_diorismou': _employee_fek_diorismou,
+        'employee_fek_diorismou_date': _employee_fek_diorismou_date,
+        'employee_birthday': _employee_birthday
+    }
+
+
+def employments_report_row_to_dict(row: list) -> dict:
+    """
+    Builds the employment request object from a row of the myschool employments report
+    """
+    _employee_am = row[0]
+    _employee_afm = row[1]
+    _employee_last_name = row[2]
+    _employee_first_name = row[3]
+    _employee_specialization_id = row[4]
+    _employee_type = row[5]
+    _employee_employment_type = row[6]
+    _employee_employment_unit_id = row[7]
+    _employee_employment_unit_name = row[8]
+
+    # compute / parse working days
+    working_days = ''
+    for col in [row[9], row[10], row[11], row[12], row[13]]:
+        try:
+            working_days += f'{int(col)}:'
+        except:
+            working_days += ''
+    
+    if working_days.endswith(':'):
+        working_days = working_days[:-1]
+
+    try:
+        _employee_employment_hours = int(row[14])
+    except:
+        _employee_employment_hours = 0
+    
+    _employee_employment_from = row[15]
+    _employee_employment_from = xl_value_to_datetime(_employee_employment_from, getattr(row, 'datemode', 0))
+    
+    _employee_employment_until = row[16]
+    _employee_employment_until = xl_value_to_datetime(_employee_employment_until, getattr(row, 'datemode', 0))
+
+    _employee_employment_status = row[17]
+
+    return {
+        'employee_am': _employee_am,
+        'employee_afm': _employee_afm,
+        'employee_last_name': _employee_last_name,
+        'employee_first_name': _employee_first_name,
+        'employee_employment_unit_id': _employee_employment_unit_id,
+        'employee_employment_unit_name': _employee_employment_unit_name,
+        'employee_specialization_id': _employee_specialization_id,
+        'employee_type': _employee_type,
+        'employee_employment_type': _employee_employment_type,
+        'employee_employment_days': working_days,
+        'employee_employment_hours': _employee_employment_hours,
+        'employee_employment_from': datetime_to_date_str(_employee_employment_from),
+        'employee_employment_until': datetime_to_date_str(_employee_employment_until),
+        'employee_employment_status': _employee_employment_status,
+    }
+
+
+def school_principals_row_to_dict(row: list) -> dict:
+    """
+    Builds the school principal request object from a row of myschool report 4.25
+    """
+    _employee_first_name = row[18]
+    _employee_last_name = row[17]
+    _employee_father_name = row[19]
+    _specialization_code = row[25]
+
+    _employee_am = row[14]
+    _employee_afm = filter_cvs_column(row[15])
+    _assignment_unit_id = filter_cvs_column(row[7])
+    _assignment_unit_name = row[8]
+    
+    return {
+        'employee_afm': _employee_afm,
+        'employee_am': _employee_am,
+        'employee_first_name': _employee_first_name,
+        'employee_last_name': _employee_last_name,
+        'employee_father_name': _employee_father_name,
+        'specialization_code': _specialization_code,
+        'assignment_unit_id': _assignment_unit_id,
+    }
+
+
+REPORT_TYPE_EMPLOYEE_04_01 = 'employee-report-04-01'
+REPORT_TYPE_EMPLOYMENTS = 'employments-report'
+REPORT_TYPE_SCHOOL_PRINCIPALS = 'school-principals'
+
+# reports that can be imported without extra options. A report is recognized
+# by the myschool file name or, failing that, by the width of its header
+REPORT_TYPES = {
+    REPORT_TYPE_EMPLOYEE_04_01: {
+        'filename': r'^stat0?4_0?1_',
+        'formats': [REPORT_FORMAT_CSV, REPORT_FORMAT_XLS, REPORT_FORMAT_XLSX],
+        'min_columns': 52,
+        'skip_rows': 1,
+        'as_text': True,
+        'resource': '/api/bulk_import/myschool/employees/',
+        'kind': 'employee',
+        'unit_key': 'employee_current_unit_id',
+        'record_key': ['employee_am', 'employee_afm'],
+        'to_dict': employee_report_04_01_row_to_dict,
+    },
+    REPORT_TYPE_SCHOOL_PRINCIPALS: {
+        'filename': r'^stat0?4_25_',
+        'formats': [REPORT_FORMAT_CSV, REPORT_FORMAT_XLS, REPORT_FORMAT_XLSX],
+        'min_columns': 26,
+        'skip_rows': 1,
+        'as_text': True,
+        'resource': '/api/bulk_import/myschool/schoolprincipals/',
+        'kind': 'school principal',
+        'unit_key': 'assignment_unit_id',
+        'record_key': ['employee_am', 'employee_afm', 'assignment_unit_id'],
+        'to_dict': school_principals_row_to_dict,
+    },
+    REPORT_TYPE_EMPLOYMENTS: {
+        'filename': r'employments',
+        'formats': [REPORT_FORMAT_XLS, REPORT_FORMAT_XLSX],
+        'min_columns': 18,
+        'skip_rows': 2,
+        'as_text': False,
+        'resource': '/api/bulk_import/myschool/employments/',
+        'kind': 'employment',
+        'unit_key': 'employee_employment_unit_id',
+        'record_key': ['employee_am', 'employee_afm', 'employee_employment_unit_id', 'employee_employment_from'],
+        'to_dict': employments_report_row_to_dict,
+    },
+}
+
+# used when a report 4.1 employee has no current unit
+DEFAULT_CURRENT_UNIT_ID = '319'
+DEFAULT_CURRENT_UNIT_NAME = 'Δ/ΝΣΗ Β/ΜΙΑΣ ΕΚΠ/ΣΗΣ Ν. ΗΡΑΚΛΕΙΟΥ'
+
+
+def detect_report_type(source, encoding: str = None) -> str:
+    """
+    Identifies which of the REPORT_TYPES a report is, returns None if it
+    is not one of them
+    """
+    if isinstance(source, (str, os.PathLike)):
+        filename = os.path.basename(source)
+        for report_type, report in REPORT_TYPES.items():
+            if re.search(report['filename'], filename, re.IGNORECASE):
+                return report_type
+
+    with open_report_source(source) as stream:
+        start = stream.tell()
+        report_format = detect_report_format(stream.read(8))
+        stream.seek(start)
+
+        header_width = 0
+        for index, row in enumerate(iter_report_rows(stream, encoding=source_encoding(source, encoding))):
+            header_width = max(header_width, len([value for value in row if value not in (None, '')]))
+            if index >= 2:
+                break
+        stream.seek(start)
+
+    # widest reports first, a 4.1 header also satisfies the narrower ones
+    for report_type, report in sorted(REPORT_TYPES.items(), key=lambda item: -item[1]['min_columns']):
+        if report_format in report['formats'] and header_width >= report['min_columns']:
+            return report_type
+
+    return None
+
+
+def encode_json_body(request_dict: dict) -> bytes:
+    """
+    Serializes a request object the same way every time, so that its
+    digest can be used as an entity tag
+    """
+    return json.dumps(request_dict, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class PhaistosSession(requests.Session):
+    """
+    requests session for the phaistos bulk import API.
+
+    When minimal_responses is set phaistos is asked (``Prefer: return=minimal``
+    and ``?fields=id``) to only return the id of the record, or nothing at all.
+    When compress is set request bodies are sent gzip compressed.
+
+    When conditional is set every upsert carries an ``If-None-Match``, so
+    that phaistos can answer 304 Not Modified or 412 Precondition Failed
+    without writing when it already holds that version of the record. The
+    ETag phaistos returned for a record (identified by record_key, AM and
+    AFM by default) is sent while the payload stays the same, otherwise the
+    digest of the payload is.
+    """
+
+    def __init__(self, minimal_responses: bool = False, compress: bool = False, conditional: bool = False,
+                 etags: dict = None):
+        super().__init__()
+        self.minimal_responses = minimal_responses
+        self.compress = compress
+        self.conditional = conditional
+        # (url, record key) : (payload digest, ETag), may be shared between sessions
+        self.etags = etags if etags is not None else {}
+
+        if minimal_responses:
+            self.headers['Prefer'] = 'return=minimal'
+            self.params['fields'] = 'id'
+
+    def clone(self) -> 'PhaistosSession':
+        """
+        Returns a new session, with its own connection pool, sending the same
+        requests as this one and sharing its ETag cache
+        """
+        return PhaistosSession(minimal_responses=self.minimal_responses, compress=self.compress,
+                               conditional=self.conditional, etags=self.etags)
+
+    def request(self, method, url, data=None, headers=None, record_key: tuple = None, **kwargs):
+        request_dict = kwargs.pop('json', None)
+        etag_key = None
+
+        if request_dict is not None and (self.compress or self.conditional):
+            data = encode_json_body(request_dict)
+            headers = dict(headers or {})
+            headers['Content-Type'] = 'application/json'
+
+            if self.conditional:
+                if record_key is None:
+                    record_key = (request_dict.get('employee_am'), request_dict.get('employee_afm'))
+                etag_key = (url, record_key)
+                digest = hashlib.sha1(data).hexdigest()
+
+                cached = self.etags.get(etag_key)
+                if cached is not None and cached[0] == digest:
+                    headers['If-None-Match'] = cached[1]
+                else:
+                    headers['If-None-Match'] = f'"{digest}"'
+
+            if self.compress:
+                data = gzip.compress(data)
+                headers['Content-Encoding'] = 'gzip'
+        elif request_dict is not None:
+            kwargs['json'] = request_dict
+
+        r = super().request(method, url, data=data, headers=headers, **kwargs)
+
+        if etag_key is not None and r.status_code in (200, 201, 204, 304, 412) and r.headers.get('ETag'):
+            self.etags[etag_key] = (digest, r.headers['ETag'])
+
+        return r
+
+
+def create_session(obj: dict) -> PhaistosSession:
+    return PhaistosSession(minimal_responses=obj.get('minimal_responses', False),
+                           compress=obj.get('compress', False),
+                           conditional=obj.get('conditional', False))
+
+
+def response_id(r: requests.Response):
+    """
+    Returns the id of the record phaistos created or updated, either from
+    the response body or, for minimal responses, from the Location header
+    """
+    if r.content:
+        try:
+            return r.json().get('id')
+        except ValueError:
+            pass
+
+    location = r.headers.get('Location')
+    if location:
+        return location.rstrip('/').rsplit('/', 1)[-1]
+
+    return None
+
+
+def response_body(r: requests.Response) -> str:
+    try:
+        return json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2)
+    except ValueError:
+        return r.text
+
+
+class ReportReader:
+    """
+    Iterates the rows of a myschool report given as a path, a file object or
+    a bytes buffer. When report_type is given the header rows and value
+    types of that report are used, unless skip_rows or as_text are given.
+    When predicates ({column index: value}) are given only the matching rows
+    are returned. File objects are read from their current position, every
+    time the reader is iterated.
+    """
+
+    def __init__(self, source, report_type: str = None, skip_rows: int = None, as_text: bool = None,
+                 encoding: str = None, predicates: dict = None):
+        self.source = source
+        self.report_type = report_type
+        self.skip_rows = skip_rows
+        self.as_text = as_text
+        self.encoding = encoding
+        self.predicates = predicates
+
+        report = REPORT_TYPES[report_type] if report_type is not None else {}
+        if self.skip_rows is None:
+            self.skip_rows = report.get('skip_rows', 0)
+        if self.as_text is None:
+            self.as_text = report.get('as_text', False)
+
+        self._start = None
+        if not isinstance(source, (str, os.PathLike, bytes, bytearray, memoryview)) and source.seekable():
+            self._start = source.tell()
+
+    def __iter__(self):
+        if self._start is not None:
+            self.source.seek(self._start)
+
+        if self.predicates:
+            return iter_filtered_report_rows(self.source, self.predicates, skip_rows=self.skip_rows,
+                                             as_text=self.as_text, encoding=self.encoding)
+
+        return iter_report_rows(self.source, skip_rows=self.skip_rows, as_text=self.as_text,
+                                encoding=self.encoding)
+
+
+def request_label(report_type: str, request_dict: dict) -> str:
+    """
+    Returns how a request object is referred to in the command output
+    """
+    if report_type == REPORT_TYPE_EMPLOYMENTS:
+        detail = request_dict.get('employee_employment_unit_id')
+    elif report_type == REPORT_TYPE_SCHOOL_PRINCIPALS:
+        detail = request_dict.get('specialization_code')
+    else:
+        detail = request_dict.get('employee_type_name')
+
+    return f"({request_dict.get('employee_am')}) {request_dict.get('employee_last_name')} {request_dict.get('employee_first_name')} {request_dict.get('employee_father_name')} [{detail}]"
+
+
+def echo_skipped(report_type: str):
+    """
+    Returns a PayloadBuilder on_skip callback echoing the skipped request objects
+    """
+    def on_skip(request_dict, reason):
+        click.echo(f"[W] skipping '{request_label(report_type, request_dict)}' since {reason}")
+
+    return on_skip
+
+
+class PayloadBuilder:
+    """
+    Turns the rows of a report into phaistos request objects. Rows that are
+    not to be imported are reported to on_skip(request_dict, reason) and
+    left out.
+    """
+
+    def __init__(self, report_type: str, skip_no_current_unit: bool = False, on_skip=None):
+        self.report_type = report_type
+        self.skip_no_current_unit = skip_no_current_unit
+        self.on_skip = on_skip
+        self._to_dict = REPORT_TYPES[report_type]['to_dict']
+
+    def build(self, row: list) -> dict:
+        """
+        Returns the request object of a row, or None if it is to be skipped
+        """
+        request_dict = self._to_dict(row)
+
+        if self.report_type == REPORT_TYPE_EMPLOYEE_04_01 and is_empty_or_null(request_dict['employee_current_unit_id']):
+            if self.skip_no_current_unit:
+                if self.on_skip is not None:
+                    self.on_skip(request_dict, 'it has no current unit')
+                return None
+
+            request_dict['employee_current_unit_id'] = DEFAULT_CURRENT_UNIT_ID
+            request_dict['employee_current_unit_name'] = DEFAULT_CURRENT_UNIT_NAME
+
+        return request_dict
+
+    def __call__(self, rows):
+        for row in rows:
+            request_dict = self.build(row)
+            if request_dict is not None:
+                yield request_dict
+
+
+class Submitter:
+    """
+    Posts request objects to a phaistos bulk import resource, given either
+    by report_type or explicitly. A session can be shared between
+    submitters, otherwise the submitter owns its session and closes it.
+    """
+
+    def __init__(self, phaistos_api: str, report_type: str = None, resource: str = None,
+                 session: requests.Session = None, debug: bool = False, **session_options):
+        if resource is None:
+            resource = REPORT_TYPES[report_type]['resource']
+
+        self.resource = phaistos_api + resource
+        self.record_key = REPORT_TYPES[report_type]['record_key'] if report_type is not None else None
+        self.debug = debug
+        self.report_type = report_type
+        self._owns_session = session is None
+        self.session = session if session is not None else PhaistosSession(**session_options)
+        # (request_dict, response) submitted by a partitioned run but not
+        # yielded, because its consumer stopped
+        self.unreported = []
+        self._runs = []
+
+    def submit(self, request_dict: dict) -> requests.Response:
+        return self._post(self.session, request_dict)
+
+    def _post(self, session: requests.Session, request_dict: dict) -> requests.Response:
+        if self.debug:
+            click.echo(f"[I] request object is {json.dumps(request_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
+
+        if self.record_key is not None and isinstance(session, PhaistosSession):
+            record_key = tuple(request_dict.get(field) for field in self.record_key)
+            return session.post(self.resource, json=request_dict, record_key=record_key)
+
+        return session.post(self.resource, json=request_dict)
+
+    def __call__(self, payloads):
+        """
+        Submits every request object, yielding (request_dict, response)
+        """
+        for request_dict in payloads:
+            yield request_dict, self.submit(request_dict)
+
+    def submit_partitioned(self, payloads, partition_key: str, workers: int):
+        """
+        Submits request objects ordered by partition_key from a pool of
+        workers. All the request objects of a partition are submitted in
+        order by the same worker, so concurrent requests never target the
+        same partition. Yields (request_dict, response) partition by
+        partition, in completion order.
+
+        Every worker thread uses its own session, a clone of the submitter
+        session. When the consumer stops early the workers stop before their
+        next request, and what they submitted in the meantime is left in
+        unreported.
+        """
+        run = {
+            'stop': threading.Event(),
+            'executor': concurrent.futures.ThreadPoolExecutor(max_workers=workers),
+            'local': threading.local(),
+            'sessions': [],
+        }
+        self._runs.append(run)
+        self.unreported = []
+
+        ready = collections.deque()
+        pending = set()
+        try:
+            for _, partition in itertools.groupby(payloads, key=lambda request_dict: partition_value(request_dict, partition_key)):
+                pending.add(run['executor'].submit(self._submit_partition, run, list(partition)))
+
+                # keep a bounded number of partitions in flight
+                if len(pending) >= workers * 2:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    _collect_results(done, ready)
+                    while ready:
+                        yield ready.popleft()
+
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                _collect_results(done, ready)
+                while ready:
+                    yield ready.popleft()
+        finally:
+            self._stop_run(run)
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    ready.extend(future.result())
+            self.unreported = list(ready)
+
+    def _submit_partition(self, run: dict, partition: list) -> list:
+        session = getattr(run['local'], 'session', None)
+        if session is None:
+            session = run['local'].session = self._worker_session()
+            run['sessions'].append(session)
+
+        results = []
+        for request_dict in partition:
+            if run['stop'].is_set():
+                break
+            results.append((request_dict, self._post(session, request_dict)))
+        return results
+
+    def _worker_session(self) -> requests.Session:
+        if isinstance(self.session, PhaistosSession):
+            return self.session.clone()
+
+        session = requests.Session()
+        session.headers.update(self.session.headers)
+        session.params.update(self.session.params)
+        session.auth = self.session.auth
+        return session
+
+    def _stop_run(self, run: dict):
+        run['stop'].set()
+        run['executor'].shutdown(wait=True, cancel_futures=True)
+        for session in run['sessions']:
+            session.close()
+        if run in self._runs:
+            self._runs.remove(run)
+
+    def close(self):
+        # a partitioned run whose consumer went away without closing it
+        for run in list(self._runs):
+            self._stop_run(run)
+
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _collect_results(done, ready: collections.deque):
+    """
+    Moves the results of finished partitions to ready, raising the first
+    error only once every successful partition was collected
+    """
+    error = None
+    for future in done:
+        if future.exception() is not None:
+            error = error or future.exception()
+        else:
+            ready.extend(future.result())
+
+    if error is not None:
+        raise error
+
+
+def partition_value(request_dict: dict, key: str) -> str:
+    """
+    Returns the value request objects are sorted and grouped by, missing
+    values are grouped together
+    """
+    return str(request_dict.get(key) or '')
+
+
+def external_sort(payloads, key: str, buffer_size: int = 50000):
+    """
+    Yields request objects ordered by their key value, keeping the original
+    order within the same value. At most buffer_size request objects are
+    held in memory, larger inputs are sorted in runs that are spilled to
+    temporary files and merged.
+    """
+    def sort_key(item):
+        return partition_value(item[1], key), item[0]
+
+    runs = []
+    buffer = []
+    try:
+        for seq, request_dict in enumerate(payloads):
+            buffer.append((seq, request_dict))
+            if len(buffer) >= buffer_size:
+                buffer.sort(key=sort_key)
+                runs.append(_spill_run(buffer))
+                buffer = []
+
+        buffer.sort(key=sort_key)
+        for _, request_dict in heapq.merge(*[_read_run(run) for run in runs], buffer, key=sort_key):
+            yield request_dict
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill_run(items: list):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8')
+    for item in items:
+        run.write(json.dumps(item, ensure_ascii=False))
+        run.write('\n')
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    for line in run:
+        seq, request_dict = json.loads(line)
+        yield seq, request_dict
+
+
+def submit_payloads(submitter: Submitter, payloads, obj: dict, unit_key: str):
+    """
+    Submits request objects as set by the --sort_by_unit and --workers
+    options, yielding (request_dict, response)
+    """
+    workers = obj.get('workers', 1)
+
+    if obj.get('sort_by_unit', False) or workers > 1:
+        payloads = external_sort(payloads, unit_key, buffer_size=obj.get('sort_buffer', 50000))
+
+    if workers > 1:
+        results = submitter.submit_partitioned(payloads, unit_key, workers)
+    else:
+        results = submitter(payloads)
+
+    try:
+        yield from results
+    except requests.RequestException as e:
+        raise click.ClickException(e)
+    finally:
+        for request_dict, r in submitter.unreported:
+            click.echo(f"[W] '{request_label(submitter.report_type, request_dict)}' was also submitted "
+                       f"before the workers stopped : HTTP/{r.status_code}")
+        submitter.unreported = []
+
+
+def ensure_report_order(obj: dict, command: str):
+    """
+    Rejects --sort_by_unit and --workers for commands that can only submit
+    records in report order
+    """
+    if obj.get('sort_by_unit', False) or obj.get('workers', 1) > 1:
+        raise click.UsageError(f'{command} submits records in report order, '
+                               f'--sort_by_unit and --workers are not supported')
+
+
+def create_submitter(obj: dict, report_type: str = None, resource: str = None) -> Submitter:
+    return Submitter(obj['phaistos_api'], report_type=report_type, resource=resource,
+                     debug=obj.get('debug', False),
+                     minimal_responses=obj.get('minimal_responses', False),
+                     compress=obj.get('compress', False),
+                     conditional=obj.get('conditional', False))
+
+
 @click.group()
 @click.option('--debug', default=False, is_flag=True)
 @click.option('--phaistos_api', default='http://localhost:8000')
+@click.option('--encoding', default=None, type=str, help='report encoding, auto-detected if not set')
+@click.option('--minimal_responses', default=False, is_flag=True, help='ask phaistos to only return record ids')
+@click.option('--compress', default=False, is_flag=True, help='gzip request bodies')
+@click.option('--conditional', default=False, is_flag=True, help='send conditional upserts, unchanged records are not rewritten')
+@click.option('--sort_by_unit', default=False, is_flag=True, help='submit records grouped by unit instead of in file order')
+@click.option('--sort_buffer', default=50000, type=click.IntRange(min=1), help='records sorted in memory before spilling to disk')
+@click.option('--workers', default=1, type=click.IntRange(min=1), help='concurrent workers, each unit is submitted by a single worker')
 @click.pass_context
-def cli(ctx, debug, phaistos_api):
+def cli(ctx, debug, phaistos_api, encoding, minimal_responses, compress, conditional, sort_by_unit, sort_buffer, workers):
     # ensure that ctx.obj exists and is a dict (in case `cli()` is called
     # by means other than the `if` block below)
     ctx.ensure_object(dict)
 
     ctx.obj['debug'] = debug
     ctx.obj['phaistos_api'] = phaistos_api
+    ctx.obj['encoding'] = encoding
+    ctx.obj['minimal_responses'] = minimal_responses
+    ctx.obj['compress'] = compress
+    ctx.obj['conditional'] = conditional
+    ctx.obj['sort_by_unit'] = sort_by_unit
+    ctx.obj['sort_buffer'] = sort_buffer
+    ctx.obj['workers'] = workers
 
 
 @cli.command()
-@click.argument('report_04_01_path', type=click.File('r', encoding='cp1253'))
+@click.argument('report_04_01_path', type=click.Path(exists=True, dir_okay=False))
 @click.option('--employee_am', default=None, type=str, help='AM of employee')
 @click.option('--employee_afm', default=None, type=str, help='AFM of employee')
 @click.option('--employee_type', default=None, type=click.Choice(['Μόνιμος', 'Αναπληρωτής', 'Αναπληρωτής ΠΔΕ']), help='employee type')
 @click.option('--skip_until_am', default=None, type=int, help='skip until employee AM')
 @click.option('--skip_no_current_unit', default=False, is_flag=True, help='skip employee if no current unit is set')
 @click.option('--continue_after_am', default=None, type=int, help='continue after employee AM')
+@click.option('--mmap', 'use_mmap', default=False, is_flag=True, help='memory map the report and only decode rows matching the filters')
 @click.pass_context
 def import_employee_report_04_01(ctx, report_04_01_path, employee_am, employee_afm, employee_type, skip_until_am, 
-                                 continue_after_am, skip_no_current_unit):
+                                 continue_after_am, skip_no_current_unit, use_mmap):
     """Import myschool employee report 01 from REPORT_04_01_PATH
     
     """
     started_on = datetime.now().replace(microsecond=0)
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
-    employee_resource = phaistos_api + "/api/bulk_import/myschool/employees/"
     
-    employee_reader = csv.reader(report_04_01_path, delimiter=';', quotechar='|')
-    row1 = next(employee_reader)  # gets the first line
-
-    with requests.Session() as s:
+    predicates = None
+    if use_mmap:
+        # most selective first, the scan is anchored on the first predicate
+        predicates = {}
+        if employee_am is not None:
+            predicates[0] = employee_am
+        if employee_afm is not None:
+            predicates[1] = employee_afm
+        if employee_type is not None:
+            predicates[47] = employee_type
+
+    employee_reader = ReportReader(report_04_01_path, REPORT_TYPE_EMPLOYEE_04_01, encoding=ctx.obj.get('encoding'),
+                                   predicates=predicates)
+
+    payload_builder = PayloadBuilder(REPORT_TYPE_EMPLOYEE_04_01, skip_no_current_unit=skip_no_current_unit,
+                                     on_skip=echo_skipped(REPORT_TYPE_EMPLOYEE_04_01))
+
+    with create_submitter(ctx.obj, REPORT_TYPE_EMPLOYEE_04_01) as submitter:
         
-        for row in employee_reader:
+        def employee_payloads():
+            for row in employee_reader:
 
-            _employee_am = row[0]
+                _employee_am = row[0]
             
-            if employee_am is not None and employee_am != _employee_am:
-                continue
+                if employee_am is not None and employee_am != _employee_am:
+                    continue
             
-            _employee_afm = filter_cvs_column(row[1])
+                _employee_afm = filter_cvs_column(row[1])
             
-            if employee_afm is not None and employee_afm != _employee_afm:
-                continue
+                if employee_afm is not None and employee_afm != _employee_afm:
+                    continue
             
-            _employee_sex = row[2]
-            _employee_last_name = row[3]
-            _employee_first_name = row[4]
-            _employee_father_name = row[5]
-            _employee_mother_name = row[6]
-            _employee_birthday = row[51]
-            _employee_telephone = row[9]
-            _employee_mobile = row[10]
-            _employee_email = row[12]
-            _employee_email_psd = row[13]
-            _employee_type_name = row[47]
-
-            if employee_type is not None and employee_type != _employee_type_name:
-                continue
+                if employee_type is not None and employee_type != row[47]:
+                    continue
 
-            _employee_current_unit_id = row[35]
-            _employee_current_unit_name = row[36]
-            _employee_specialization_id = row[14]
-            _employee_specialization_name = row[15]
-            _employee_mandatory_week_workhours = row[25]
-            _employee_mk = row[19]
-            _employee_bathmos = row[18]
-            _employee_first_workday_date = row[32]
-            _employee_fek_diorismou = row[20]
-            _employee_fek_diorismou_date = row[21]
-    
-            # normalization
-            _employee_current_unit_id = filter_cvs_column(_employee_current_unit_id)
+                employee_dict = payload_builder.build(row)
 
-            employee_dict = {
-                'employee_am': _employee_am,
-                'employee_afm': _employee_afm,
-                'employee_sex': _employee_sex,
-                'employee_last_name': _employee_last_name,
-                'employee_first_name': _employee_first_name,
-                'employee_father_name': _employee_father_name,
-                'employee_mother_name': _employee_mother_name,
-                'employee_telephone': _employee_telephone,
-                'employee_mobile': _employee_mobile,
-                'employee_email': _employee_email,
-                'employee_email_psd': _employee_email_psd,
-                'employee_type_name': _employee_type_name,
-                'employee_current_unit_id': _employee_current_unit_id,
-                'employee_current_unit_name': _employee_current_unit_name,
-                'employee_specialization_id': _employee_specialization_id,
-                'employee_specialization_name': _employee_specialization_name,
-                'employee_mandatory_week_workhours': _employee_mandatory_week_workhours,
-                'employee_mk': _employee_mk,
-                'employee_bathmos': _employee_bathmos,
-                'employee_first_workday_date': _employee_first_workday_date,
-                'employee_fek_diorismou': _employee_fek_diorismou,
-                'employee_fek_diorismou_date': _employee_fek_diorismou_date,
-                'employee_birthday': _employee_birthday
-            }
+                if employee_dict is None:
+                    continue
 
-            employee_label = f"({employee_dict.get('employee_am')}) {employee_dict.get('employee_last_name')} {employee_dict.get('employee_first_name')} {employee_dict.get('employee_father_name')} [{employee_dict.get('employee_type_name')}]"
+                yield employee_dict
 
-            if is_empty_or_null(_employee_current_unit_id):
-                if skip_no_current_unit:
-                    click.echo(f"[W] skipping '{employee_label}' since it has no current unit")
-                    continue
-                else:
-                    employee_dict['employee_current_unit_id'] = '319'
-                    employee_dict['employee_current_unit_name'] = 'Δ/ΝΣΗ Β/ΜΙΑΣ ΕΚΠ/ΣΗΣ Ν. ΗΡΑΚΛΕΙΟΥ'
-        
+        for employee_dict, r in submit_payloads(submitter, employee_payloads(), ctx.obj, 'employee_current_unit_id'):
+
+            employee_label = f"({employee_dict.get('employee_am')}) {employee_dict.get('employee_last_name')} {employee_dict.get('employee_first_name')} {employee_dict.get('employee_father_name')} [{employee_dict.get('employee_type_name')}]"
 
-            if debug:
-                click.echo(f"[I] request object is {json.dumps(employee_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
-            
             try:
-                r = s.post(employee_resource, json=employee_dict)
-                
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added employee '{employee_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added employee '{employee_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
                     
-                elif r.status_code == 200:
+                elif r.status_code in (200, 204):
                     # employee was updated
-                    click.echo(f"[I] successfully UPDATED employee '{employee_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully UPDATED employee '{employee_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] employee '{employee_label}' is unchanged")
                 elif r.status_code == 404:
                     # employee could not matched with phaistos
                     click.echo(f"[W] could not found employee {employee_label} in phaistos")
@@ -189,7 +1147,7 @@ def import_employee_report_04_01(ctx, report_04_01_path, employee_am, employee_a
                     click.echo(f"[W] failed inserting/updating employee '{employee_label}'")
                     click.echo(f"[W] Response : HTTP/{r.status_code}")
                     click.echo()
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     raise click.Abort()
                 
                 
@@ -202,7 +1160,7 @@ def import_employee_report_04_01(ctx, report_04_01_path, employee_am, employee_a
     
 
 @cli.command()
-@click.argument('report_01_07_path', type=click.File('r', encoding='cp1253'))
+@click.argument('report_01_07_path', type=click.Path(exists=True, dir_okay=False))
 @click.option('--employee_am', default=None, type=str, help='AM of employee')
 @click.option('--employee_afm', default=None, type=str, help='AFM of employee')
 @click.option('--skip_until_am', default=None, type=int, help='skip until employee AM')
@@ -215,99 +1173,99 @@ def import_employee_report_01_07(ctx, report_01_07_path, employee_am, employee_a
     started_on = datetime.now().replace(microsecond=0)
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
-    employee_resource = phaistos_api + "/api/bulk_import/myschool/employees/"
     
-    employee_reader = csv.reader(report_01_07_path, delimiter=';', quotechar='|')
-    row1 = next(employee_reader)  # gets the first line
+    employee_reader = iter_report_rows(report_01_07_path, skip_rows=1, as_text=True, encoding=ctx.obj.get('encoding'))
 
-    with requests.Session() as s:
+    with create_submitter(ctx.obj, resource='/api/bulk_import/myschool/employees/') as submitter:
         
-        for row in employee_reader:
+        def employee_payloads():
+            for row in employee_reader:
 
-            _employee_am = row[0]
+                _employee_am = row[0]
             
-            if employee_am is not None and employee_am != _employee_am:
-                continue
+                if employee_am is not None and employee_am != _employee_am:
+                    continue
             
-            _employee_afm = filter_cvs_column(row[1])
+                _employee_afm = filter_cvs_column(row[1])
             
-            if employee_afm is not None and employee_afm != _employee_afm:
-                continue
+                if employee_afm is not None and employee_afm != _employee_afm:
+                    continue
             
-            _employee_sex = row[2]
-            _employee_last_name = row[3]
-            _employee_first_name = row[4]
-            _employee_father_name = row[5]
-            _employee_mother_name = row[6]
-            _employee_birthday = row[49]
-            _employee_telephone = row[9]
-            _employee_mobile = row[10]
-            _employee_email = row[12]
-            _employee_email_psd = row[13]
-            _employee_type_name = f'Διοικητικός {row[47]}'
-
-            if _employee_type_name == 'Διοικητικός Μόνιμος':
-                _employee_type_name = 'Διοικητικός'
-
-            _employee_current_unit_id = row[35]
-            _employee_current_unit_name = row[36]
-            _employee_specialization_id = row[14]
-            _employee_specialization_name = row[15]
-            _employee_mandatory_week_workhours = row[25]
-            _employee_mk = row[19]
-            _employee_bathmos = row[18]
-            _employee_first_workday_date = row[32]
-            _employee_fek_diorismou = row[20]
-            _employee_fek_diorismou_date = row[21]
+                _employee_sex = row[2]
+                _employee_last_name = row[3]
+                _employee_first_name = row[4]
+                _employee_father_name = row[5]
+                _employee_mother_name = row[6]
+                _employee_birthday = row[49]
+                _employee_telephone = row[9]
+                _employee_mobile = row[10]
+                _employee_email = row[12]
+                _employee_email_psd = row[13]
+                _employee_type_name = f'Διοικητικός {row[47]}'
+
+                if _employee_type_name == 'Διοικητικός Μόνιμος':
+                    _employee_type_name = 'Διοικητικός'
+
+                _employee_current_unit_id = row[35]
+                _employee_current_unit_name = row[36]
+                _employee_specialization_id = row[14]
+                _employee_specialization_name = row[15]
+                _employee_mandatory_week_workhours = row[25]
+                _employee_mk = row[19]
+                _employee_bathmos = row[18]
+                _employee_first_workday_date = row[32]
+                _employee_fek_diorismou = row[20]
+                _employee_fek_diorismou_date = row[21]
     
 
-            # normalization
-            _employee_current_unit_id = filter_cvs_column(_employee_current_unit_id)
-
-            employee_dict = {
-                'employee_am': _employee_am,
-                'employee_afm': _employee_afm,
-                'employee_sex': _employee_sex,
-                'employee_last_name': _employee_last_name,
-                'employee_first_name': _employee_first_name,
-                'employee_father_name': _employee_father_name,
-                'employee_mother_name': _employee_mother_name,
-                'employee_telephone': _employee_telephone,
-                'employee_mobile': _employee_mobile,
-                'employee_email': _employee_email,
-                'employee_email_psd': _employee_email_psd,
-                'employee_type_name': _employee_type_name,
-                'employee_current_unit_id': _employee_current_unit_id,
-                'employee_current_unit_name': _employee_current_unit_name,
-                'employee_specialization_id': _employee_specialization_id,
-                'employee_specialization_name': _employee_specialization_name,
-                'employee_mandatory_week_workhours': _employee_mandatory_week_workhours,
-                'employee_mk': _employee_mk,
-                'employee_bathmos': _employee_bathmos,
-                'employee_first_workday_date': _employee_first_workday_date,
-                'employee_fek_diorismou': _employee_fek_diorismou,
-                'employee_fek_diorismou_date': _employee_fek_diorismou_date,
-                'employee_birthday': _employee_birthday
-            }
+                # normalization
+                _employee_current_unit_id = filter_cvs_column(_employee_current_unit_id)
+
+                employee_dict = {
+                    'employee_am': _employee_am,
+                    'employee_afm': _employee_afm,
+                    'employee_sex': _employee_sex,
+                    'employee_last_name': _employee_last_name,
+                    'employee_first_name': _employee_first_name,
+                    'employee_father_name': _employee_father_name,
+                    'employee_mother_name': _employee_mother_name,
+                    'employee_telephone': _employee_telephone,
+                    'employee_mobile': _employee_mobile,
+                    'employee_email': _employee_email,
+                    'employee_email_psd': _employee_email_psd,
+                    'employee_type_name': _employee_type_name,
+                    'employee_current_unit_id': _employee_current_unit_id,
+                    'employee_current_unit_name': _employee_current_unit_name,
+                    'employee_specialization_id': _employee_specialization_id,
+                    'employee_specialization_name': _employee_specialization_name,
+                    'employee_mandatory_week_workhours': _employee_mandatory_week_workhours,
+                    'employee_mk': _employee_mk,
+                    'employee_bathmos': _employee_bathmos,
+                    'employee_first_workday_date': _employee_first_workday_date,
+                    'employee_fek_diorismou': _employee_fek_diorismou,
+                    'employee_fek_diorismou_date': _employee_fek_diorismou_date,
+                    'employee_birthday': _employee_birthday
+                }
+
+                yield employee_dict
+
+        for employee_dict, r in submit_payloads(submitter, employee_payloads(), ctx.obj, 'employee_current_unit_id'):
 
             employee_label = f"({employee_dict.get('employee_am')}) {employee_dict.get('employee_last_name')} {employee_dict.get('employee_first_name')} {employee_dict.get('employee_father_name')} [{employee_dict.get('employee_type_name')}]"
 
-
-            if debug:
-                click.echo(f"[I] request object is {json.dumps(employee_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
-            
             try:
-                r = s.post(employee_resource, json=employee_dict)
-                
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added employee '{employee_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added employee '{employee_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
                     
-                elif r.status_code == 200:
+                elif r.status_code in (200, 204):
                     # employee was updated
-                    click.echo(f"[I] successfully UPDATED employee '{employee_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully UPDATED employee '{employee_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] employee '{employee_label}' is unchanged")
                 elif r.status_code == 404:
                     # employee could not matched with phaistos
                     click.echo(f"[W] could not found employee {employee_label} in phaistos")
@@ -316,7 +1274,7 @@ def import_employee_report_01_07(ctx, report_01_07_path, employee_am, employee_a
                     click.echo(f"[W] failed inserting/updating employee '{employee_label}'")
                     click.echo(f"[W] Response : HTTP/{r.status_code}")
                     click.echo()
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     raise click.Abort()
                 
                 
@@ -342,118 +1300,48 @@ def import_employments_report(ctx, employments_report_path, employee_am, employe
     started_on = datetime.now().replace(microsecond=0)
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
-    employment_resource = phaistos_api + "/api/bulk_import/myschool/employments/"
     
-    book = xlrd.open_workbook(employments_report_path, encoding_override='cp1253')
-    sh = book.sheet_by_index(0)
+    employment_reader = ReportReader(employments_report_path, REPORT_TYPE_EMPLOYMENTS, encoding=ctx.obj.get('encoding'))
+    payload_builder = PayloadBuilder(REPORT_TYPE_EMPLOYMENTS)
     
-    with requests.Session() as s:
+    with create_submitter(ctx.obj, REPORT_TYPE_EMPLOYMENTS) as submitter:
         
-        for rx in range(2, sh.nrows):
-            
-            row = sh.row(rx)
+        def employment_payloads():
+            for row in employment_reader:
             
-            _employee_am = row[0].value
-            
-            if employee_am is not None and employee_am != _employee_am:
-                continue
+                _employee_am = row[0]
             
-            _employee_afm = row[1].value
+                if employee_am is not None and employee_am != _employee_am:
+                    continue
             
-            if employee_afm is not None and employee_afm != _employee_afm:
-                continue
+                _employee_afm = row[1]
             
-            _employee_last_name = row[2].value
-            _employee_first_name = row[3].value
-            _employee_specialization_id = row[4].value
-            _employee_type = row[5].value
-            _employee_employment_type = row[6].value
-            _employee_employment_unit_id = row[7].value
-            _employee_employment_unit_name = row[8].value
-
-            # compute / parse working days
-            working_days = ''
-            for col in [row[9], row[10], row[11], row[12], row[13]]:
-                try:
-                    working_days += f'{int(col.value)}:'
-                except:
-                    working_days += ''
+                if employee_afm is not None and employee_afm != _employee_afm:
+                    continue
             
-            if working_days.endswith(':'):
-                working_days = working_days[:-1]
+                employee_dict = payload_builder.build(row)
 
-            try:
-                _employee_employment_hours = int(row[14].value)
-            except:
-                _employee_employment_hours = 0
-            
-            _employee_employment_from = row[15].value
-            _employee_employment_from = datetime(*xlrd.xldate_as_tuple(_employee_employment_from, book.datemode))
-            
-            _employee_employment_until = row[16].value
-            _employee_employment_until = datetime(*xlrd.xldate_as_tuple(_employee_employment_until, book.datemode))
-
-            _employee_employment_status = row[17].value
-
-            # _employee_email = row[12]
-            # _employee_email_psd = row[13]
-            # _employee_type_name = f'Διοικητικός {row[47]}'
-
-            # if _employee_type_name == 'Διοικητικός Μόνιμος':
-            #     _employee_type_name = 'Διοικητικός'
-
-            # _employee_current_unit_id = row[35]
-            # _employee_current_unit_name = row[36]
-            # _employee_specialization_id = row[14]
-            # _employee_specialization_name = row[15]
-            # _employee_mandatory_week_workhours = row[25]
-            # _employee_mk = row[19]
-            # _employee_bathmos = row[18]
-            # _employee_first_workday_date = row[32]
-            # _employee_fek_diorismou = row[20]
-            # _employee_fek_diorismou_date = row[21]
-    
+                print(employee_dict)
 
-            
-            employee_dict = {
-                'employee_am': _employee_am,
-                'employee_afm': _employee_afm,
-                'employee_last_name': _employee_last_name,
-                'employee_first_name': _employee_first_name,
-                'employee_employment_unit_id': _employee_employment_unit_id,
-                'employee_employment_unit_name': _employee_employment_unit_name,
-                'employee_specialization_id': _employee_specialization_id,
-                'employee_type': _employee_type,
-                'employee_employment_type': _employee_employment_type,
-                'employee_employment_days': working_days,
-                'employee_employment_hours': _employee_employment_hours,
-                'employee_employment_from': datetime_to_date_str(_employee_employment_from),
-                'employee_employment_until': datetime_to_date_str(_employee_employment_until),
-                'employee_employment_status': _employee_employment_status,
-            }
+                yield employee_dict
 
-            print(employee_dict)
-            employment_label = f"({employee_dict.get('employee_am')}) {employee_dict.get('employee_last_name')} {employee_dict.get('employee_first_name')} {employee_dict.get('employee_father_name')} [{employee_dict.get('employee_type_name')}]"
+        for employee_dict, r in submit_payloads(submitter, employment_payloads(), ctx.obj, 'employee_employment_unit_id'):
 
+            employment_label = f"({employee_dict.get('employee_am')}) {employee_dict.get('employee_last_name')} {employee_dict.get('employee_first_name')} {employee_dict.get('employee_father_name')} [{employee_dict.get('employee_type_name')}]"
 
-            if debug:
-                click.echo(f"[I] request object is {json.dumps(employee_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
-            
-            
-            
-        
             try:
-                r = s.post(employment_resource, json=employee_dict)
-                
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
                     
-                elif r.status_code == 200:
+                elif r.status_code in (200, 204):
                     # employee was updated
-                    click.echo(f"[I] successfully UPDATED employment '{employment_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully UPDATED employment '{employment_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] employment '{employment_label}' is unchanged")
                 elif r.status_code == 404:
                     # employee could not matched with phaistos
                     click.echo(f"[W] could not found employment {employment_label} in phaistos")
@@ -462,7 +1350,7 @@ def import_employments_report(ctx, employments_report_path, employee_am, employe
                     click.echo(f"[W] failed inserting/updating employment '{employment_label}'")
                     click.echo(f"[W] Response : HTTP/{r.status_code}")
                     click.echo()
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     raise click.Abort()
                 
                 
@@ -489,43 +1377,44 @@ def import_deputy_hiring_report(ctx, report_path, employee_afm, dide, phase, ski
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
     api_resource = phaistos_api + "/api/bulk_import/substitute_employment_announcement/"
+
+    ensure_report_order(ctx.obj, 'import-deputy-hiring-report')
     
-    book = openpyxl.load_workbook(report_path)
-    sh = book.worksheets[0]
+    report_reader = iter_report_rows(report_path, skip_rows=1, encoding=ctx.obj.get('encoding'))
     
-    with requests.Session() as s:
-        for row in sh.iter_rows(min_row=2, max_row=sh.max_row):
+    with create_session(ctx.obj) as s:
+        for row in report_reader:
         
             
             #row = sh.row(rx)
-            _xrimatodotisi = row[0].value
-            _aa = row[1].value
-            _aa_rois = row[2].value
-            _source = row[3].value
-            _employee_afm = row[4].value
-
-            _employee_last_name = row[5].value
-            _employee_first_name = row[6].value
-            _employee_father_name = row[7].value
-            _employee_mother_name = row[8].value
-            _employee_klados_id = row[9].value
-            _employee_specialization_id = row[10].value
-            _pinakas = row[11].value
-            _seira_pinaka = row[12].value
-            _moria_pinaka = row[13].value
-            _perioxh_topothetisis = row[14].value
-            _orario = row[15].value
-            _dide = row[16].value
-            _periferia = row[17].value
-            _employee_address_city = row[18].value
-            _employee_address_line = row[19].value
-            _employee_address_postal_code = row[20].value
-            _employee_telephone = row[21].value
-            _employee_mobile = row[22].value
-            _employee_email = row[23].value
-            _employee_birthday = row[24].value
-            _employee_adt = row[25].value
-            _proslipsi = row[26].value
+            _xrimatodotisi = row[0]
+            _aa = row[1]
+            _aa_rois = row[2]
+            _source = row[3]
+            _employee_afm = row[4]
+
+            _employee_last_name = row[5]
+            _employee_first_name = row[6]
+            _employee_father_name = row[7]
+            _employee_mother_name = row[8]
+            _employee_klados_id = row[9]
+            _employee_specialization_id = row[10]
+            _pinakas = row[11]
+            _seira_pinaka = row[12]
+            _moria_pinaka = row[13]
+            _perioxh_topothetisis = row[14]
+            _orario = row[15]
+            _dide = row[16]
+            _periferia = row[17]
+            _employee_address_city = row[18]
+            _employee_address_line = row[19]
+            _employee_address_postal_code = row[20]
+            _employee_telephone = row[21]
+            _employee_mobile = row[22]
+            _employee_email = row[23]
+            _employee_birthday = row[24]
+            _employee_adt = row[25]
+            _proslipsi = row[26]
 
 
             
@@ -556,7 +1445,7 @@ def import_deputy_hiring_report(ctx, report_path, employee_afm, dide, phase, ski
                 'employee_telephone': _employee_telephone,
                 'employee_mobile': _employee_mobile,
                 'employee_email': _employee_email,
-                'employee_birthday': datetime_to_date_str(_employee_birthday),
+                'employee_birthday': datetime_to_date_str(xl_value_to_datetime(_employee_birthday, getattr(row, 'datemode', 0))),
                 'employee_adt': _employee_adt,
                 
             }
@@ -576,13 +1465,16 @@ def import_deputy_hiring_report(ctx, report_path, employee_afm, dide, phase, ski
                 
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
                     
-                elif r.status_code == 200:
+                elif r.status_code in (200, 204):
                     # employee was updated
-                    click.echo(f"[I] successfully UPDATED employment '{employment_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully UPDATED employment '{employment_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] employment '{employment_label}' is unchanged")
                 elif r.status_code == 404:
                     # employee could not matched with phaistos
                     click.echo(f"[W] could not found employment {employment_label} in phaistos")
@@ -591,7 +1483,7 @@ def import_deputy_hiring_report(ctx, report_path, employee_afm, dide, phase, ski
                     click.echo(f"[W] failed inserting/updating employment '{employment_label}'")
                     click.echo(f"[W] Response : HTTP/{r.status_code}")
                     click.echo()
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     raise click.Abort()
                 
                 
@@ -619,17 +1511,13 @@ def import_deputy_placement_report(ctx, report_path, employee_afm, phase, skip_u
     started_on = datetime.now().replace(microsecond=0)
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
-    api_resource = phaistos_api + "/api/bulk_import/substitute_employment_placement/"
     
-    book = openpyxl.load_workbook(report_path)
-    sh = book.worksheets[0]
+    report_reader = iter_report_rows(report_path, encoding=ctx.obj.get('encoding'))
 
     
     # determine indexes
-    header_row = sh[1]
-    for cell in header_row:
-        cell_value = cell.value
-        col_idx = cell.col_idx - 1
+    header_row = next(report_reader)
+    for col_idx, cell_value in enumerate(header_row):
         if cell_value in ['ΑΦΜ', 'Α.Φ.Μ.']:
             _employee_afm_idx = col_idx
         elif cell_value in ['ΗΜ. ΠΡΟΣΛΗΨΗΣ']:
@@ -651,63 +1539,64 @@ def import_deputy_placement_report(ctx, report_path, employee_afm, phase, skip_u
         elif cell_value in ['ΤΥΠΟΣ ΚΕΝΟΥ']:
             _employment_source_code_idx = col_idx
     
-    with requests.Session() as s:
-        for row in sh.iter_rows(min_row=2, max_row=sh.max_row):
+    with create_submitter(ctx.obj, resource='/api/bulk_import/substitute_employment_placement/') as submitter:
+
+        def placement_payloads():
+            for row in report_reader:
             
-            #row = sh.row(rx)
-            _employment_start_date = datetime_to_date_str(row[_employment_start_date_idx].value)
-            _employee_afm = row[_employee_afm_idx].value
-            _employee_last_name = row[_employee_last_name_idx].value
-            _employee_first_name = row[_employee_first_name_idx].value
-            _employement_specialization = row[_employement_specialization_idx].value
-            _employment_hour_type = row[_employment_hour_type_idx].value
-            _employment_work_hours = row[_employment_work_hours_idx].value
-            _employement_school_code = row[_employement_school_code_idx].value
-            _employement_is_main_school = row[_employement_is_main_school_idx].value 
-            _employment_source_code = row[_employment_source_code_idx].value
+                #row = sh.row(rx)
+                _employment_start_date = datetime_to_date_str(xl_value_to_datetime(row[_employment_start_date_idx], getattr(row, 'datemode', 0)))
+                _employee_afm = row[_employee_afm_idx]
+                _employee_last_name = row[_employee_last_name_idx]
+                _employee_first_name = row[_employee_first_name_idx]
+                _employement_specialization = row[_employement_specialization_idx]
+                _employment_hour_type = row[_employment_hour_type_idx]
+                _employment_work_hours = row[_employment_work_hours_idx]
+                _employement_school_code = row[_employement_school_code_idx]
+                _employement_is_main_school = row[_employement_is_main_school_idx] 
+                _employment_source_code = row[_employment_source_code_idx]
             
-            if employee_afm is not None and employee_afm != _employee_afm:
-                continue
+                if employee_afm is not None and employee_afm != _employee_afm:
+                    continue
             
-            request_dict = {
-                'phase': phase,
-                'employment_start_date': _employment_start_date,
-                'employee_afm': _employee_afm,
-                'employee_last_name': _employee_last_name,
-                'employee_first_name': _employee_first_name,
-                'employement_specialization_id': _employement_specialization,
-                'employment_source_code': _employment_source_code,
-                'employment_hour_type': _employment_hour_type,
-                'employment_work_hours': _employment_work_hours,
-                'employement_school_code': _employement_school_code,
-                'employement_is_main_school':  str_to_bool(_employement_is_main_school)
-            }
-
-            print(_employement_is_main_school)
+                request_dict = {
+                    'phase': phase,
+                    'employment_start_date': _employment_start_date,
+                    'employee_afm': _employee_afm,
+                    'employee_last_name': _employee_last_name,
+                    'employee_first_name': _employee_first_name,
+                    'employement_specialization_id': _employement_specialization,
+                    'employment_source_code': _employment_source_code,
+                    'employment_hour_type': _employment_hour_type,
+                    'employment_work_hours': _employment_work_hours,
+                    'employement_school_code': _employement_school_code,
+                    'employement_is_main_school':  str_to_bool(_employement_is_main_school)
+                }
+
+                print(_employement_is_main_school)
+
+                yield request_dict
+
+        for request_dict, r in submit_payloads(submitter, placement_payloads(), ctx.obj, 'employement_school_code'):
 
-             
             employment_label = f"({request_dict.get('employee_am')}) {request_dict.get('employee_last_name')} {request_dict.get('employee_first_name')} {request_dict.get('employee_father_name')} [{request_dict.get('employee_type_name')}]"
 
-
-            if debug:
-                click.echo(f"[I] request object is {json.dumps(request_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
-            
-            
             try:
-                r = s.post(api_resource, json=request_dict)
-                
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added employment '{employment_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
-                elif r.status_code == 200:
-                    click.echo(f"[I] employment alreay found '{employment_label}' with ID {r.json().get('id')}")
+                elif r.status_code in (200, 204):
+                    click.echo(f"[I] employment alreay found '{employment_label}' with ID {response_id(r)}")
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] employment '{employment_label}' is unchanged")
                 elif r.status_code == 404:
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     click.echo(f"[W] could not found hiring announcement for placement '{employment_label}'")
                     continue
                 else:
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     click.echo(f"[W] {r.status_code} : could to process {employment_label} in phaistos")
                     raise click.Abort()
                 
@@ -719,7 +1608,7 @@ def import_deputy_placement_report(ctx, report_path, employee_afm, phase, skip_u
             
 
 @cli.command()
-@click.argument('report_path', type=click.File('r', encoding='cp1253'))
+@click.argument('report_path', type=click.Path(exists=True, dir_okay=False))
 @click.option('--employee_afm', default=None, type=str, help='AFM of employee')
 @click.option('--skip_until_afm', default=None, type=int, help='skip until employee AFM')
 @click.option('--continue_after_afm', default=None, type=int, help='continue after employee AFM')
@@ -735,61 +1624,44 @@ def import_school_principals(ctx, report_path, employee_afm, skip_until_afm, con
     started_on = datetime.now().replace(microsecond=0)
     debug = ctx.obj.get('debug', False)
     phaistos_api = ctx.obj['phaistos_api']
-    api_resource = phaistos_api + "/api/bulk_import/myschool/schoolprincipals/"
     
-    csv_reader = csv.reader(report_path, delimiter=';', quotechar='|')
-    row1 = next(csv_reader)  # gets the first line    
+    csv_reader = ReportReader(report_path, REPORT_TYPE_SCHOOL_PRINCIPALS, encoding=ctx.obj.get('encoding'))
+    payload_builder = PayloadBuilder(REPORT_TYPE_SCHOOL_PRINCIPALS)
     
-    with requests.Session() as s:
-        for row in csv_reader:
-            
+    with create_submitter(ctx.obj, REPORT_TYPE_SCHOOL_PRINCIPALS) as submitter:
+
+        def school_principal_payloads():
+            for row in csv_reader:
             
-            #row = sh.row(rx)
-            _employee_first_name = row[18]
-            _employee_last_name = row[17]
-            _employee_father_name = row[19]
-            _specialization_code = row[25]
-
-            _employee_am = row[14]
-            _employee_afm = filter_cvs_column(row[15])
-            _assignment_unit_id = filter_cvs_column(row[7])
-            _assignment_unit_name = row[8]
             
-            if employee_afm is not None and employee_afm != _employee_afm:
-                continue
+                #row = sh.row(rx)
+                if employee_afm is not None and employee_afm != filter_cvs_column(row[15]):
+                    continue
             
-            request_dict = {
-                'employee_afm': _employee_afm,
-                'employee_am': _employee_am,
-                'employee_first_name': _employee_first_name,
-                'employee_last_name': _employee_last_name,
-                'employee_father_name': _employee_father_name,
-                'specialization_code': _specialization_code,
-                'assignment_unit_id': _assignment_unit_id,
-            }
+                request_dict = payload_builder.build(row)
 
-             
-            school_principal_label = f"({request_dict.get('employee_am')}) {request_dict.get('employee_last_name')} {request_dict.get('employee_first_name')} {request_dict.get('employee_father_name')} [{request_dict.get('specialization_code')}]"
+                yield request_dict
 
+        for request_dict, r in submit_payloads(submitter, school_principal_payloads(), ctx.obj, 'assignment_unit_id'):
+
+            school_principal_label = f"({request_dict.get('employee_am')}) {request_dict.get('employee_last_name')} {request_dict.get('employee_first_name')} {request_dict.get('employee_father_name')} [{request_dict.get('specialization_code')}]"
 
-            if debug:
-                click.echo(f"[I] request object is {json.dumps(request_dict, ensure_ascii=False, sort_keys=True, indent=2)}")
-            
             try:
-                r = s.post(api_resource, json=request_dict)
-                
                 if r.status_code == 201:
                     # employee was created
-                    click.echo(f"[I] successfully added school principal '{school_principal_label}' with ID {r.json().get('id')}")
+                    click.echo(f"[I] successfully added school principal '{school_principal_label}' with ID {response_id(r)}")
                     #click.echo(json.dumps(r.json(), sort_keys=True, indent=2))
-                elif r.status_code == 200:
-                    click.echo(f"[I] school principal already found '{school_principal_label}' with ID {r.json().get('id')}")
+                elif r.status_code in (200, 204):
+                    click.echo(f"[I] school principal already found '{school_principal_label}' with ID {response_id(r)}")
+                elif r.status_code in (304, 412):
+                    # conditional request, phaistos already has this version
+                    click.echo(f"[I] school principal '{school_principal_label}' is unchanged")
                 elif r.status_code == 404:
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     click.echo(f"[W] could not add school principal '{school_principal_label}'")
                     raise click.Abort()
                 else:
-                    click.echo(json.dumps(r.json(), sort_keys=True, ensure_ascii=False, indent=2))
+                    click.echo(response_body(r))
                     click.echo(f"[W] {r.status_code} : could to process {school_principal_label} in phaistos")
                     raise click.Abort()
                 
@@ -797,4 +1669,331 @@ def import_school_principals(ctx, report_path, employee_afm, skip_until_afm, con
                 #return True
 
             except Exception as e:
-                raise click.ClickException(e)
\ No newline at end of file
+                raise click.ClickException(e)
+
+def _post_request_object(submitter: Submitter, request_dict: dict, kind: str, label: str) -> bool:
+    """
+    Posts a request object and reports the outcome. Returns True if phaistos
+    created or updated the record
+    """
+    try:
+        r = submitter.submit(request_dict)
+    except requests.RequestException as e:
+        raise click.ClickException(e)
+
+    if r.status_code == 201:
+        click.echo(f"[I] successfully added {kind} '{label}' with ID {response_id(r)}")
+        return True
+    elif r.status_code in (200, 204):
+        click.echo(f"[I] successfully UPDATED {kind} '{label}' with ID {response_id(r)}")
+        return True
+    elif r.status_code in (304, 412):
+        click.echo(f"[I] {kind} '{label}' is unchanged")
+        return True
+    else:
+        click.echo(f"[W] failed inserting/updating {kind} '{label}'")
+        click.echo(f"[W] Response : HTTP/{r.status_code}")
+        click.echo()
+        click.echo(response_body(r))
+        return False
+
+
+def _index_rows_by_employee(rows, am_idx: int, afm_idx: int) -> dict:
+    """
+    Groups report rows by employee AM and AFM, so that they can be joined
+    with report 4.1
+    """
+    index = {'am': {}, 'afm': {}}
+    for row in rows:
+        _am = cell_value_to_str(row[am_idx])
+        _afm = filter_cvs_column(cell_value_to_str(row[afm_idx]))
+        key = ('am', _am) if not is_empty_or_null(_am) else ('afm', _afm)
+        index[key[0]].setdefault(key[1], []).append(row)
+    return index
+
+
+def _pop_employee_rows(index: dict, employee_am: str, employee_afm: str) -> list:
+    return index['am'].pop(employee_am, []) + index['afm'].pop(employee_afm, [])
+
+
+@cli.command()
+@click.argument('report_04_01_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--employments_report', 'employments_report_path', default=None,
+              type=click.Path(exists=True, dir_okay=False), help='myschool employments report')
+@click.option('--principals_report', 'principals_report_path', default=None,
+              type=click.Path(exists=True, dir_okay=False), help='myschool school principals report (4.25)')
+@click.option('--employee_am', default=None, type=str, help='AM of employee')
+@click.option('--employee_afm', default=None, type=str, help='AFM of employee')
+@click.option('--employee_type', default=None, type=click.Choice(['Μόνιμος', 'Αναπληρωτής', 'Αναπληρωτής ΠΔΕ']), help='employee type')
+@click.option('--skip_no_current_unit', default=False, is_flag=True, help='skip employee if no current unit is set')
+@click.pass_context
+def sync_all(ctx, report_04_01_path, employments_report_path, principals_report_path, employee_am, employee_afm,
+             employee_type, skip_no_current_unit):
+    """
+    Import employees (report 4.1) together with their employments and school
+    principal assignments (report 4.25) in a single pass
+
+    """
+
+    # phaistos_importer sync-all stat4_1.csv --employments_report employments.xls --principals_report stat4_25.csv
+
+    # employments and principal records are submitted right after their employee
+    ensure_report_order(ctx.obj, 'sync-all')
+
+    debug = ctx.obj.get('debug', False)
+    encoding = ctx.obj.get('encoding')
+    phaistos_api = ctx.obj['phaistos_api']
+
+    # employments and principals are a fraction of report 4.1, keep them in
+    # memory and stream the employees against them
+    employments = _index_rows_by_employee(
+        ReportReader(employments_report_path, REPORT_TYPE_EMPLOYMENTS, encoding=encoding)
+        if employments_report_path is not None else [], 0, 1)
+    principals = _index_rows_by_employee(
+        ReportReader(principals_report_path, REPORT_TYPE_SCHOOL_PRINCIPALS, encoding=encoding)
+        if principals_report_path is not None else [], 14, 15)
+
+    employee_builder = PayloadBuilder(REPORT_TYPE_EMPLOYEE_04_01, skip_no_current_unit=skip_no_current_unit,
+                                      on_skip=echo_skipped(REPORT_TYPE_EMPLOYEE_04_01))
+    employment_builder = PayloadBuilder(REPORT_TYPE_EMPLOYMENTS)
+    principal_builder = PayloadBuilder(REPORT_TYPE_SCHOOL_PRINCIPALS)
+
+    stats = {'employees': 0, 'employments': 0, 'principals': 0, 'failed': 0, 'skipped': 0}
+
+    # all three resources go through a single connection pool
+    with create_session(ctx.obj) as s:
+        employee_submitter = Submitter(phaistos_api, REPORT_TYPE_EMPLOYEE_04_01, session=s, debug=debug)
+        employment_submitter = Submitter(phaistos_api, REPORT_TYPE_EMPLOYMENTS, session=s, debug=debug)
+        principal_submitter = Submitter(phaistos_api, REPORT_TYPE_SCHOOL_PRINCIPALS, session=s, debug=debug)
+
+        def submit_employments(rows):
+            for row in rows:
+                employment_dict = employment_builder.build(row)
+                employment_label = request_label(REPORT_TYPE_EMPLOYMENTS, employment_dict)
+                if _post_request_object(employment_submitter, employment_dict, 'employment', employment_label):
+                    stats['employments'] += 1
+                else:
+                    stats['failed'] += 1
+
+        def submit_principals(rows):
+            for row in rows:
+                principal_dict = principal_builder.build(row)
+                principal_label = request_label(REPORT_TYPE_SCHOOL_PRINCIPALS, principal_dict)
+                if _post_request_object(principal_submitter, principal_dict, 'school principal', principal_label):
+                    stats['principals'] += 1
+                else:
+                    stats['failed'] += 1
+
+        for row in ReportReader(report_04_01_path, REPORT_TYPE_EMPLOYEE_04_01, encoding=encoding):
+
+            _employee_am = row[0]
+            _employee_afm = filter_cvs_column(row[1])
+
+            if employee_am is not None and employee_am != _employee_am:
+                continue
+
+            if employee_afm is not None and employee_afm != _employee_afm:
+                continue
+
+            if employee_type is not None and employee_type != row[47]:
+                continue
+
+            employee_employments = _pop_employee_rows(employments, _employee_am, _employee_afm)
+            employee_principals = _pop_employee_rows(principals, _employee_am, _employee_afm)
+
+            employee_dict = employee_builder.build(row)
+
+            if employee_dict is None:
+                stats['skipped'] += len(employee_employments) + len(employee_principals)
+                continue
+
+            employee_label = request_label(REPORT_TYPE_EMPLOYEE_04_01, employee_dict)
+
+            if not _post_request_object(employee_submitter, employee_dict, 'employee', employee_label):
+                # employments and principal records depend on the employee
+                stats['failed'] += 1
+                stats['skipped'] += len(employee_employments) + len(employee_principals)
+                click.echo(f"[W] skipping {len(employee_employments)} employment(s) and {len(employee_principals)} principal record(s) of '{employee_label}'")
+                continue
+
+            stats['employees'] += 1
+            submit_employments(employee_employments)
+            submit_principals(employee_principals)
+
+        # records of employees not found in report 4.1, e.g. administrative
+        # staff, are submitted as the standalone commands would do
+        if employee_type is None:
+            leftover_employments = [row for rows in list(employments['am'].values()) + list(employments['afm'].values()) for row in rows]
+            leftover_principals = [row for rows in list(principals['am'].values()) + list(principals['afm'].values()) for row in rows]
+            submit_employments(row for row in leftover_employments
+                               if (employee_am is None or employee_am == cell_value_to_str(row[0]))
+                               and (employee_afm is None or employee_afm == cell_value_to_str(row[1])))
+            submit_principals(row for row in leftover_principals
+                              if (employee_am is None or employee_am == row[14])
+                              and (employee_afm is None or employee_afm == filter_cvs_column(row[15])))
+
+    click.echo(f"[I] submitted {stats['employees']} employee(s), {stats['employments']} employment(s) and "
+               f"{stats['principals']} principal record(s), {stats['failed']} failed, {stats['skipped']} skipped")
+
+
+WATCH_STATE_FILE = '.phaistos_importer_state.json'
+
+
+def file_content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_digest(row: list) -> str:
+    return hashlib.blake2b(json.dumps(row, default=str, ensure_ascii=False).encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+
+@cli.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--interval', default=10, type=int, help='seconds between directory scans')
+@click.option('--state_file', default=None, type=click.Path(dir_okay=False),
+              help=f'where imported rows are remembered, defaults to DIRECTORY/{WATCH_STATE_FILE}')
+@click.option('--skip_no_current_unit', default=False, is_flag=True, help='skip employee if no current unit is set')
+@click.option('--once', default=False, is_flag=True, help='scan the directory once and exit')
+@click.pass_context
+def watch(ctx, directory, interval, state_file, skip_no_current_unit, once):
+    """
+    Watch DIRECTORY for new or changed myschool reports and import the rows
+    that changed since the previous version of the same report
+
+    """
+
+    # phaistos_importer watch /srv/myschool-reports --interval 60
+
+    ensure_report_order(ctx.obj, 'watch')
+
+    debug = ctx.obj.get('debug', False)
+    encoding = ctx.obj.get('encoding')
+    phaistos_api = ctx.obj['phaistos_api']
+
+    if state_file is None:
+        state_file = os.path.join(directory, WATCH_STATE_FILE)
+
+    # files : content hash of every file already processed
+    # checked : (mtime, size) of every file at the time it was hashed
+    # rows : digests of the imported rows of the latest version of each report type
+    state = {'files': {}, 'checked': {}, 'rows': {}}
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state.update(json.load(f))
+
+    def save_state():
+        with open(state_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(state_file + '.tmp', state_file)
+
+    # (mtime, size) of every file seen in the previous scan, a file is only
+    # processed once it stopped changing between two scans
+    last_seen = {}
+
+    builders = {report_type: PayloadBuilder(report_type, skip_no_current_unit=skip_no_current_unit,
+                                            on_skip=echo_skipped(report_type))
+                for report_type in REPORT_TYPES}
+
+    # the connection pool stays warm between files
+    with create_session(ctx.obj) as s:
+        submitters = {report_type: Submitter(phaistos_api, report_type, session=s, debug=debug)
+                      for report_type in REPORT_TYPES}
+
+        def import_report(path, report_type):
+            report = REPORT_TYPES[report_type]
+            previous_rows = set(state['rows'].get(report_type, []))
+            imported_rows = []
+            imported, unchanged, failed = 0, 0, 0
+
+            try:
+                for row in ReportReader(path, report_type, encoding=encoding):
+                    digest = row_digest(row)
+                    if digest in previous_rows:
+                        imported_rows.append(digest)
+                        unchanged += 1
+                        continue
+
+                    request_dict = builders[report_type].build(row)
+                    if request_dict is None:
+                        continue
+
+                    label = request_label(report_type, request_dict)
+
+                    if _post_request_object(submitters[report_type], request_dict, report['kind'], label):
+                        imported_rows.append(digest)
+                        imported += 1
+                    else:
+                        # not remembered, so that it is retried with the next version
+                        failed += 1
+            except BaseException:
+                # keep what was imported so far, rows not reached yet are
+                # still known from the previous version
+                state['rows'][report_type] = sorted(previous_rows.union(imported_rows))
+                raise
+
+            state['rows'][report_type] = imported_rows
+            click.echo(f"[I] {os.path.basename(path)} ({report_type}) : {imported} imported, "
+                       f"{unchanged} unchanged, {failed} failed")
+
+        try:
+            while True:
+                entries = []
+                for entry in os.scandir(directory):
+                    if entry.name.startswith(('.', '~$')) or entry.name.endswith(('.part', '.crdownload', '.tmp')):
+                        continue
+
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # removed or renamed since the directory was listed
+                        continue
+
+                    entries.append((stat.st_mtime, entry.name, entry, stat))
+
+                for _, _, entry, stat in sorted(entries, key=lambda item: item[:2]):
+                    signature = (stat.st_mtime, stat.st_size)
+                    if last_seen.get(entry.name) != signature:
+                        last_seen[entry.name] = signature
+                        if not once:
+                            # still being written, or just appeared
+                            continue
+                    elif state['checked'].get(entry.name) == list(signature):
+                        continue
+
+                    # a file that cannot be read or imported is retried with
+                    # the next scan and does not stop the watch
+                    try:
+                        content_hash = file_content_hash(entry.path)
+                        if state['files'].get(entry.name) != content_hash:
+                            report_type = detect_report_type(entry.path, encoding=encoding)
+                            if report_type is None:
+                                if debug:
+                                    click.echo(f"[I] ignoring {entry.name}, not a known report")
+                            else:
+                                click.echo(f"[I] importing {entry.name} as {report_type}")
+                                import_report(entry.path, report_type)
+                    except Exception as e:
+                        message = e.message if isinstance(e, click.ClickException) else repr(e)
+                        click.echo(f"[W] failed importing {entry.name} : {message}")
+                        save_state()
+                        continue
+
+                    state['checked'][entry.name] = list(signature)
+                    state['files'][entry.name] = content_hash
+                    save_state()
+
+                if once:
+                    break
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            save_state()
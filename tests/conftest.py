@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class MockPhaistosHandler(BaseHTTPRequestHandler):
+    """
+    A minimal phaistos bulk import API. Records are upserted by AM and AFM
+    (and the fields of server.extra_key), honouring ``Prefer: return=minimal``,
+    gzip request bodies and ``If-None-Match``.
+
+    When server.unit_key is set, requests of the same unit hold a per-unit
+    lock for server.delay seconds, and requests arriving while the lock of
+    their unit is held are recorded in server.overlaps. Records whose AM is
+    in server.fail are answered with that status.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        request_dict = json.loads(body)
+        key = (url.path, request_dict.get('employee_am'), request_dict.get('employee_afm')) + \
+            tuple(request_dict.get(field) for field in server.extra_key)
+
+        with server.lock:
+            server.requests.append({
+                'path': url.path,
+                'query': parse_qs(url.query),
+                'headers': dict(self.headers),
+                'json': request_dict,
+            })
+            record = server.records.get(key)
+
+        if server.unit_key is not None:
+            unit = str(request_dict.get(server.unit_key) or '')
+            with server.lock:
+                unit_lock = server.unit_locks.setdefault(unit, threading.Lock())
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+            if not unit_lock.acquire(blocking=False):
+                with server.lock:
+                    server.overlaps.append(unit)
+                unit_lock.acquire()
+            try:
+                time.sleep(server.delay)
+            finally:
+                unit_lock.release()
+                with server.lock:
+                    server.in_flight -= 1
+
+        status = server.fail.get(request_dict.get('employee_am'))
+        if status is not None:
+            out = json.dumps({'detail': 'rejected'}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+            return
+
+        if_none_match = self.headers.get('If-None-Match')
+        if record is not None and if_none_match in (record['etag'], f'"{record["digest"]}"'):
+            self._respond(server.unchanged_status, record)
+            return
+
+        with server.lock:
+            created = record is None
+            if created:
+                record = {'id': len(server.records) + 1, 'version': 0}
+                server.records[key] = record
+            record['version'] += 1
+            record['json'] = request_dict
+            record['digest'] = hashlib.sha1(body).hexdigest()
+            record['etag'] = f'W/"{record["id"]}-{record["version"]}"'
+            server.writes += 1
+
+        if self.headers.get('Prefer') == 'return=minimal':
+            self._respond(201 if created else 204, record)
+        else:
+            self._respond(201 if created else 200, record, {'id': record['id'], **request_dict})
+
+    def _respond(self, status, record, content=None):
+        out = json.dumps(content).encode('utf-8') if content is not None else b''
+
+        self.send_response(status)
+        self.send_header('ETag', record['etag'])
+        self.send_header('Location', f'{urlparse(self.path).path}{record["id"]}/')
+        if content is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def phaistos():
+    """
+    Runs the mock phaistos API on a free local port, yielding the server.
+    Its base url is server.url.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockPhaistosHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.records = {}
+    server.writes = 0
+    server.extra_key = ()
+    server.unchanged_status = 304
+    server.unit_key = None
+    server.delay = 0
+    server.unit_locks = {}
+    server.overlaps = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.fail = {}
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
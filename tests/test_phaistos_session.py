@@ -0,0 +1,103 @@
+import pytest
+
+import phaistos_importer
+from phaistos_importer import PhaistosSession, Submitter, REPORT_TYPE_EMPLOYEE_04_01, response_id
+
+
+EMPLOYEE = {
+    'employee_am': '600123',
+    'employee_afm': '012345678',
+    'employee_last_name': 'ΠΑΠΑΔΟΠΟΥΛΟΣ',
+    'employee_first_name': 'ΓΕΩΡΓΙΟΣ',
+    'employee_current_unit_id': '319',
+}
+
+
+def submitter(phaistos, **session_options):
+    return Submitter(phaistos.url, REPORT_TYPE_EMPLOYEE_04_01, **session_options)
+
+
+def test_created_record_id_is_read_from_the_body(phaistos):
+    with submitter(phaistos) as s:
+        r = s.submit(EMPLOYEE)
+
+    assert r.status_code == 201
+    assert response_id(r) == 1
+
+
+def test_minimal_responses_id_is_read_from_location(phaistos):
+    with submitter(phaistos, minimal_responses=True) as s:
+        created = s.submit(EMPLOYEE)
+        updated = s.submit({**EMPLOYEE, 'employee_current_unit_id': '1001'})
+
+    assert phaistos.requests[0]['headers']['Prefer'] == 'return=minimal'
+    assert phaistos.requests[0]['query'] == {'fields': ['id']}
+
+    assert created.status_code == 201 and created.content == b''
+    assert updated.status_code == 204 and updated.content == b''
+    assert response_id(created) == '1'
+    assert response_id(updated) == '1'
+
+
+def test_compressed_body_is_gzipped_json(phaistos):
+    with submitter(phaistos, compress=True) as s:
+        r = s.submit(EMPLOYEE)
+
+    assert r.status_code == 201
+    assert phaistos.requests[0]['headers']['Content-Encoding'] == 'gzip'
+    assert phaistos.requests[0]['json'] == EMPLOYEE
+
+
+@pytest.mark.parametrize('unchanged_status', [304, 412])
+def test_conditional_unchanged_record_is_not_written(phaistos, unchanged_status):
+    phaistos.unchanged_status = unchanged_status
+
+    with submitter(phaistos, conditional=True, compress=True) as s:
+        assert s.submit(EMPLOYEE).status_code == 201
+        assert s.submit(EMPLOYEE).status_code == unchanged_status
+
+    assert phaistos.writes == 1
+
+
+def test_conditional_sends_the_cached_etag_of_the_record(phaistos):
+    with submitter(phaistos, conditional=True) as s:
+        first = s.submit(EMPLOYEE)
+        s.submit(EMPLOYEE)
+
+    assert phaistos.requests[0]['headers']['If-None-Match'].startswith('"')
+    assert phaistos.requests[1]['headers']['If-None-Match'] == first.headers['ETag']
+
+
+def test_conditional_changed_record_is_written(phaistos):
+    with submitter(phaistos, conditional=True) as s:
+        first = s.submit(EMPLOYEE)
+        r = s.submit({**EMPLOYEE, 'employee_current_unit_id': '1001'})
+
+    assert r.status_code == 200
+    assert phaistos.requests[1]['headers']['If-None-Match'] != first.headers['ETag']
+    assert phaistos.writes == 2
+
+
+def test_etags_are_cached_per_record(phaistos):
+    other = {**EMPLOYEE, 'employee_am': '600124', 'employee_afm': '012345679'}
+
+    with submitter(phaistos, conditional=True) as s:
+        s.submit(EMPLOYEE)
+        s.submit(other)
+        s.submit(EMPLOYEE)
+
+    assert phaistos.requests[2]['headers']['If-None-Match'] == phaistos.records[
+        ('/api/bulk_import/myschool/employees/', '600123', '012345678')]['etag']
+    assert phaistos.writes == 2
+
+
+@pytest.mark.parametrize('unchanged_status', [304, 412])
+def test_post_request_object_reports_unchanged_records(phaistos, capsys, unchanged_status):
+    phaistos.unchanged_status = unchanged_status
+
+    with PhaistosSession(conditional=True) as session:
+        s = Submitter(phaistos.url, REPORT_TYPE_EMPLOYEE_04_01, session=session)
+        assert phaistos_importer._post_request_object(s, EMPLOYEE, 'employee', 'label')
+        assert phaistos_importer._post_request_object(s, EMPLOYEE, 'employee', 'label')
+
+    assert "employee 'label' is unchanged" in capsys.readouterr().out
@@ -0,0 +1,49 @@
+import io
+from datetime import datetime
+
+import openpyxl
+
+from phaistos_importer import ReportReader, REPORT_TYPE_EMPLOYMENTS, REPORT_TYPE_SCHOOL_PRINCIPALS
+
+
+CSV_REPORT = 'ΑΜ;ΑΦΜ;ΕΠΩΝΥΜΟ\n600123;012345678;ΠΑΠΑΔΟΠΟΥΛΟΣ\n600124;012345679;ΓΕΩΡΓΙΟΥ\n'
+
+
+def employments_xlsx() -> bytes:
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(['employments'])
+    sheet.append(['ΑΜ', 'ΑΦΜ'])
+    sheet.append(['600123', '012345678', 'Α', 'Β', 'ΠΕ70', 'Μόνιμος', 'Οργανική', 9051000, 'ΣΧΟΛΕΙΟ',
+                  1, 1, 1, 1, 1, 24, datetime(2024, 9, 1), datetime(2025, 6, 30), 'Ενεργή'])
+    stream = io.BytesIO()
+    book.save(stream)
+    return stream.getvalue()
+
+
+def test_file_object_can_be_iterated_twice():
+    reader = ReportReader(io.BytesIO(CSV_REPORT.encode('cp1253')), skip_rows=1)
+
+    assert list(reader) == list(reader)
+    assert len(list(reader)) == 2
+
+
+def test_text_file_object_ignores_the_encoding_override():
+    reader = ReportReader(io.StringIO(CSV_REPORT), skip_rows=1, encoding='cp1253')
+
+    assert [row[2] for row in reader] == ['ΠΑΠΑΔΟΠΟΥΛΟΣ', 'ΓΕΩΡΓΙΟΥ']
+
+
+def test_explicit_skip_rows_overrides_the_report_type():
+    reader = ReportReader(CSV_REPORT.encode('utf-8'), REPORT_TYPE_SCHOOL_PRINCIPALS, skip_rows=0)
+
+    assert len(list(reader)) == 3
+
+
+def test_predicates_keep_the_value_types_of_the_report():
+    reader = ReportReader(employments_xlsx(), REPORT_TYPE_EMPLOYMENTS, predicates={7: '9051000'})
+    rows = list(reader)
+
+    assert len(rows) == 1
+    assert rows[0][15] == datetime(2024, 9, 1)
+    assert rows[0][14] == 24
@@ -0,0 +1,96 @@
+from click.testing import CliRunner
+
+import phaistos_importer
+from phaistos_importer import Submitter, REPORT_TYPE_SCHOOL_PRINCIPALS
+
+
+def principals_report(path, units: int, principals: int) -> str:
+    lines = [';'.join(f'h{col}' for col in range(26))]
+    for unit in range(units):
+        for principal in range(principals):
+            row = [''] * 26
+            # the last unit has no id, its records still form a single partition
+            row[7] = f'90510{unit:02d}' if unit < units - 1 else ''
+            row[14] = f'6{unit:02d}{principal:03d}'
+            row[15] = f'0{unit:02d}{principal:06d}'
+            row[17], row[18], row[19] = 'ΕΠΩΝΥΜΟ', 'ΟΝΟΜΑ', 'ΠΑΤΡΩΝΥΜΟ'
+            row[25] = 'ΠΕ70'
+            lines.append(';'.join(row))
+
+    report_path = path / 'stat4_25_test.csv'
+    report_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(report_path)
+
+
+def import_principals(phaistos, report_path, *options):
+    return CliRunner().invoke(phaistos_importer.cli, ['--phaistos_api', phaistos.url, *options,
+                                                      'import-school-principals', report_path])
+
+
+def test_workers_never_submit_the_same_unit_concurrently(phaistos, tmp_path):
+    phaistos.unit_key = 'assignment_unit_id'
+    phaistos.delay = 0.01
+    report_path = principals_report(tmp_path, units=8, principals=5)
+
+    result = import_principals(phaistos, report_path, '--workers', '4')
+
+    assert result.exit_code == 0, result.output
+    assert phaistos.writes == 40
+    assert phaistos.overlaps == []
+    assert phaistos.max_in_flight > 1
+
+    # a unit is submitted in report order
+    for unit in {request['json']['assignment_unit_id'] for request in phaistos.requests}:
+        ams = [request['json']['employee_am'] for request in phaistos.requests
+               if request['json']['assignment_unit_id'] == unit]
+        assert ams == sorted(ams)
+
+
+def test_workers_stop_when_the_import_aborts(phaistos, tmp_path):
+    phaistos.unit_key = 'assignment_unit_id'
+    phaistos.delay = 0.05
+    # first record of the second unit, submitted together with the first and third
+    phaistos.fail = {'600000': 500}
+    report_path = principals_report(tmp_path, units=12, principals=10)
+
+    result = import_principals(phaistos, report_path, '--workers', '3')
+
+    assert result.exit_code != 0
+    # the first three units, plus at most a couple of requests per worker
+    # sent before they noticed the abort
+    assert len(phaistos.requests) <= 3 * 10 + 2 * 3
+    assert 'was also submitted before the workers stopped' in result.output
+    assert phaistos.overlaps == []
+
+
+def test_worker_sessions_are_not_the_submitter_session(phaistos):
+    payloads = [{'employee_am': str(am), 'assignment_unit_id': str(am % 3)} for am in range(9)]
+
+    with Submitter(phaistos.url, REPORT_TYPE_SCHOOL_PRINCIPALS, conditional=True) as submitter:
+        adapters = dict(submitter.session.adapters)
+        results = list(submitter.submit_partitioned(sorted(payloads, key=lambda p: p['assignment_unit_id']),
+                                                    'assignment_unit_id', workers=3))
+
+        assert submitter.session.adapters == adapters
+        assert len(submitter.session.etags) == 9
+
+    assert sorted(request_dict['employee_am'] for request_dict, _ in results) == sorted(p['employee_am'] for p in payloads)
+
+
+def test_workers_must_be_positive(phaistos, tmp_path):
+    report_path = principals_report(tmp_path, units=1, principals=1)
+
+    result = import_principals(phaistos, report_path, '--workers', '0')
+
+    assert result.exit_code == 2
+
+
+def test_sync_all_rejects_workers(phaistos, tmp_path):
+    report_path = principals_report(tmp_path, units=1, principals=1)
+
+    result = CliRunner().invoke(phaistos_importer.cli, ['--phaistos_api', phaistos.url, '--workers', '2',
+                                                        'sync-all', report_path])
+
+    assert result.exit_code == 2
+    assert 'not supported' in result.output
+    assert phaistos.requests == []